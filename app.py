@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
+import pyarrow.parquet as pq
 import plotly.express as px
-from plotly.subplots import make_subplots
-import pickle
 import os
 from datetime import datetime, timedelta
+from functools import cached_property
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -78,206 +78,293 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+HISTORICAL_DATA_PATH = "data/preprocessed/system_metrics_preprocessed.parquet"
+CPU_FORECAST_PATH = "artifacts/cpu_usage_percent_forecast.csv"
+MEMORY_FORECAST_PATH = "artifacts/memory_usage_percent_forecast.csv"
+FORECAST_PATHS = {
+    'cpu_usage_percent': CPU_FORECAST_PATH,
+    'memory_usage_percent': MEMORY_FORECAST_PATH,
+}
+
+# Above this many points the historical trace is drawn with WebGL instead of SVG
+SCATTERGL_MIN_ROWS = 1000
+# The chart is ~1000px wide, so more points than this are invisible overdraw
+DOWNSAMPLE_TARGET_POINTS = 2000
+# Above this many points markers are sub-pixel apart and only add rasterization cost
+MARKERS_MAX_ROWS = 2000
+
+def _file_mtime(path):
+    """Modification time of path, or None if it doesn't exist (uncached: it keys the other caches)"""
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _get_model_info(artifacts_dir="artifacts"):
+    """Get information about trained models"""
+    model_info = {}
+    
+    if os.path.exists(artifacts_dir):
+        for model_type in ['cpu_usage_percent', 'memory_usage_percent']:
+            model_file = f"{artifacts_dir}/{model_type}_sarima.npz"
+            if os.path.exists(model_file):
+                mod_time = os.path.getmtime(model_file)
+                model_info[model_type] = datetime.fromtimestamp(mod_time)
+    
+    return model_info
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_history(path, mtime):
+    """Load historical data (mtime is only a cache key so rewrites invalidate the cache)"""
+    df = pd.read_parquet(path)
+    # Everything is UTC by convention; a tz-naive index keeps pandas off its slow tz-aware paths
+    if df.index.tz is not None:
+        df.index = df.index.tz_convert('UTC').tz_localize(None)
+    return df
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _last_row(path, mtime):
+    """Read only the last row group of a Parquet file, or None if it has no rows"""
+    parquet_file = pq.ParquetFile(path)
+    if parquet_file.metadata.num_rows == 0:
+        return None
+    last_group = parquet_file.read_row_group(parquet_file.num_row_groups - 1).to_pandas()
+    return {col: float(value) for col, value in last_group.select_dtypes('number').iloc[-1].items()}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_forecast(path, mtime, value_col):
+    """Load a forecast CSV (mtime is only a cache key so retraining invalidates the cache)"""
+    df = pd.read_csv(path, index_col='timestamp', parse_dates=['timestamp'], dtype={value_col: 'float32'})
+    if df.index.tz is not None:
+        df.index = df.index.tz_convert('UTC').tz_localize(None)
+    return df
+
+def _downsample(series, target=DOWNSAMPLE_TARGET_POINTS):
+    """Decimate a series to at most `target` points, always keeping the newest sample"""
+    step = max(1, -(-len(series) // target))
+    # Step back from the last row so the chart runs right up to the forecast start
+    return series.iloc[::-step].iloc[::-1]
+
+# A handful of entries per chart: keys change on every ingestion/retrain, so old figures must be evicted
+@st.cache_data(max_entries=8, show_spinner=False)
+def _build_combined_chart(metric_name, historical_col, _historical_data, _forecast_data,
+                          color_hist, color_forecast, hist_mtime, forecast_mtime):
+    """Build the historical + forecast figure (the file mtimes stand in for hashing the frames)"""
+    data = []
+    
+    if _historical_data is not None:
+        # Historical data (WebGL for long histories, SVG otherwise)
+        history = _downsample(_historical_data[historical_col])
+        data.append({
+            'type': 'scattergl' if len(_historical_data) > SCATTERGL_MIN_ROWS else 'scatter',
+            'x': history.index,
+            'y': history.values,
+            'mode': 'lines' if len(_historical_data) > MARKERS_MAX_ROWS else 'lines+markers',
+            'name': f'Historical {metric_name}',
+            'line': {'color': color_hist, 'width': 2},
+            'marker': {'size': 4},
+            'hovertemplate': f'<b>Historical {metric_name}</b><br>' +
+                             'Time: %{x}<br>' +
+                             'Value: %{y:.2f}%<br>' +
+                             '<extra></extra>'
+        })
+    
+    if _forecast_data is not None:
+        # Forecast data
+        forecast_col = f"{historical_col}_forecast"
+        if forecast_col in _forecast_data.columns:
+            data.append({
+                'type': 'scatter',
+                'x': _forecast_data.index,
+                'y': _forecast_data[forecast_col].values,
+                'mode': 'lines+markers',
+                'name': f'Forecasted {metric_name}',
+                'line': {'color': color_forecast, 'width': 3, 'dash': 'dash'},
+                'marker': {'size': 6, 'symbol': 'diamond'},
+                'hovertemplate': f'<b>Forecasted {metric_name}</b><br>' +
+                                 'Time: %{x}<br>' +
+                                 'Value: %{y:.2f}%<br>' +
+                                 '<extra></extra>'
+            })
+            
+            # Note: Removed forecast start annotation to avoid visual clutter
+    
+    return {
+        'data': data,
+        'layout': {
+            'title': {'text': f"{metric_name} - Historical vs Forecasted"},
+            'xaxis': {'title': {'text': "Time (UTC)"}},
+            'yaxis': {'title': {'text': f"{metric_name} (%)"}},
+            'hovermode': 'x unified',
+            'template': 'plotly_white',
+            'height': 500,
+            'showlegend': True,
+            'legend': {
+                'orientation': "h",
+                'yanchor': "bottom",
+                'y': 1.02,
+                'xanchor': "right",
+                'x': 1
+            }
+        }
+    }
+
+def _error_figure(title, error):
+    """Empty figure carrying an error message"""
+    return {
+        'data': [],
+        'layout': {
+            'title': {'text': title},
+            'annotations': [{
+                'text': f"Error: {str(error)}",
+                'xref': "paper", 'yref': "paper",
+                'x': 0.5, 'y': 0.5, 'xanchor': 'center', 'yanchor': 'middle',
+                'showarrow': False, 'font': {'size': 16}
+            }]
+        }
+    }
+
 class DashboardApp:
+    """Data is loaded lazily so each view path only reads the files it shows"""
+    
     def __init__(self):
-        self.historical_data = None
-        self.cpu_forecast = None
-        self.memory_forecast = None
-        self.load_data()
+        # mtime each file had when its data was read, so cache keys can't run ahead of the data
+        self._loaded_mtimes = {}
     
-    def load_data(self):
-        """Load historical data and forecasts"""
+    @cached_property
+    def historical_data(self):
+        """Historical data, or None if it hasn't been generated yet"""
         try:
-            # Load historical data
-            if os.path.exists("data/preprocessed/system_metrics_preprocessed.csv"):
-                self.historical_data = pd.read_csv(
-                    "data/preprocessed/system_metrics_preprocessed.csv",
-                    index_col='timestamp',
-                    parse_dates=True
-                )
-                # Ensure timezone consistency
-                if self.historical_data.index.tz is None:
-                    self.historical_data.index = self.historical_data.index.tz_localize('UTC')
-                else:
-                    self.historical_data.index = self.historical_data.index.tz_convert('UTC')
-            
-            # Load forecasts
-            self.load_forecasts()
-            
+            history_mtime = _file_mtime(HISTORICAL_DATA_PATH)
+            if history_mtime is None:
+                return None
+            self._loaded_mtimes[HISTORICAL_DATA_PATH] = history_mtime
+            return _load_history(HISTORICAL_DATA_PATH, history_mtime)
         except Exception as e:
             st.error(f"Error loading data: {e}")
-            self.historical_data = None
+            return None
     
-    def load_forecasts(self):
-        """Load forecast data from CSV files"""
+    @cached_property
+    def latest_metrics(self):
+        """Most recent metric values, read from the tail of the file only"""
         try:
-            if os.path.exists("artifacts/cpu_usage_percent_forecast.csv"):
-                cpu_df = pd.read_csv("artifacts/cpu_usage_percent_forecast.csv")
-                cpu_df['timestamp'] = pd.to_datetime(cpu_df['timestamp'], utc=True)
-                self.cpu_forecast = cpu_df.set_index('timestamp')
-            
-            if os.path.exists("artifacts/memory_usage_percent_forecast.csv"):
-                memory_df = pd.read_csv("artifacts/memory_usage_percent_forecast.csv")
-                memory_df['timestamp'] = pd.to_datetime(memory_df['timestamp'], utc=True)
-                self.memory_forecast = memory_df.set_index('timestamp')
-                
+            history_mtime = _file_mtime(HISTORICAL_DATA_PATH)
+            if history_mtime is None:
+                return None
+            return _last_row(HISTORICAL_DATA_PATH, history_mtime)
+        except Exception as e:
+            st.error(f"Error loading data: {e}")
+            return None
+    
+    @cached_property
+    def cpu_forecast(self):
+        """CPU forecast, or None if no model has been trained yet"""
+        return self.load_forecast(CPU_FORECAST_PATH, 'cpu_usage_percent_forecast')
+    
+    @cached_property
+    def memory_forecast(self):
+        """Memory forecast, or None if no model has been trained yet"""
+        return self.load_forecast(MEMORY_FORECAST_PATH, 'memory_usage_percent_forecast')
+    
+    def load_forecast(self, path, value_col):
+        """Load forecast data from a CSV file"""
+        try:
+            forecast_mtime = _file_mtime(path)
+            if forecast_mtime is None:
+                return None
+            self._loaded_mtimes[path] = forecast_mtime
+            return _load_forecast(path, forecast_mtime, value_col)
         except Exception as e:
             st.warning(f"Could not load forecasts: {e}")
-            self.cpu_forecast = None
-            self.memory_forecast = None
+            return None
     
     def get_model_info(self):
         """Get information about trained models"""
-        model_info = {}
-        artifacts_dir = "artifacts"
-        
-        if os.path.exists(artifacts_dir):
-            for model_type in ['cpu_usage_percent', 'memory_usage_percent']:
-                model_file = f"{artifacts_dir}/{model_type}_arima_model.pkl"
-                if os.path.exists(model_file):
-                    mod_time = os.path.getmtime(model_file)
-                    model_info[model_type] = datetime.fromtimestamp(mod_time)
-        
-        return model_info
+        return _get_model_info()
     
     def create_combined_chart(self, metric_name, historical_col, forecast_data, color_hist, color_forecast):
         """Create a combined historical + forecast chart"""
         try:
-            fig = go.Figure()
-            
-            if self.historical_data is not None:
-                # Historical data
-                fig.add_trace(go.Scatter(
-                    x=self.historical_data.index,
-                    y=self.historical_data[historical_col],
-                    mode='lines+markers',
-                    name=f'Historical {metric_name}',
-                    line=dict(color=color_hist, width=2),
-                    marker=dict(size=4),
-                    hovertemplate=f'<b>Historical {metric_name}</b><br>' +
-                                 'Time: %{x}<br>' +
-                                 'Value: %{y:.2f}%<br>' +
-                                 '<extra></extra>'
-                ))
-            
-            if forecast_data is not None:
-                # Forecast data
-                forecast_col = f"{historical_col}_forecast"
-                if forecast_col in forecast_data.columns:
-                    fig.add_trace(go.Scatter(
-                        x=forecast_data.index,
-                        y=forecast_data[forecast_col],
-                        mode='lines+markers',
-                        name=f'Forecasted {metric_name}',
-                        line=dict(color=color_forecast, width=3, dash='dash'),
-                        marker=dict(size=6, symbol='diamond'),
-                        hovertemplate=f'<b>Forecasted {metric_name}</b><br>' +
-                                     'Time: %{x}<br>' +
-                                     'Value: %{y:.2f}%<br>' +
-                                     '<extra></extra>'
-                    ))
-                    
-                    # Note: Removed forecast start annotation to avoid visual clutter
-            
-            # Update layout
-            fig.update_layout(
-                title=f"{metric_name} - Historical vs Forecasted",
-                xaxis_title="Time",
-                yaxis_title=f"{metric_name} (%)",
-                hovermode='x unified',
-                template='plotly_white',
-                height=500,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
+            historical_data = self.historical_data
+            return _build_combined_chart(
+                metric_name, historical_col, historical_data, forecast_data,
+                color_hist, color_forecast,
+                self._loaded_mtimes.get(HISTORICAL_DATA_PATH) if historical_data is not None else None,
+                self._loaded_mtimes.get(FORECAST_PATHS[historical_col]) if forecast_data is not None else None
             )
             
-            return fig
-            
         except Exception as e:
             # Return empty figure if there's an error
-            fig = go.Figure()
-            fig.update_layout(
-                title=f"{metric_name} - Error Loading Chart",
-                annotations=[
-                    dict(
-                        text=f"Error: {str(e)}",
-                        xref="paper", yref="paper",
-                        x=0.5, y=0.5, xanchor='center', yanchor='middle',
-                        showarrow=False, font=dict(size=16)
-                    )
-                ]
-            )
-            return fig
+            return _error_figure(f"{metric_name} - Error Loading Chart", e)
     
     def create_forecast_only_chart(self):
         """Create a chart showing only forecasts for both metrics"""
         try:
-            fig = make_subplots(
-                rows=2, cols=1,
-                subplot_titles=('CPU Usage Forecast', 'Memory Usage Forecast'),
-                vertical_spacing=0.1
-            )
+            data = []
             
             if self.cpu_forecast is not None and 'cpu_usage_percent_forecast' in self.cpu_forecast.columns:
-                fig.add_trace(
-                    go.Scatter(
-                        x=self.cpu_forecast.index,
-                        y=self.cpu_forecast['cpu_usage_percent_forecast'],
-                        mode='lines+markers',
-                        name='CPU Forecast',
-                        line=dict(color='#ff6b6b', width=3),
-                        marker=dict(size=8, symbol='circle')
-                    ),
-                    row=1, col=1
-                )
+                data.append({
+                    'type': 'scatter',
+                    'x': self.cpu_forecast.index,
+                    'y': self.cpu_forecast['cpu_usage_percent_forecast'].values,
+                    'mode': 'lines+markers',
+                    'name': 'CPU Forecast',
+                    'line': {'color': '#ff6b6b', 'width': 3},
+                    'marker': {'size': 8, 'symbol': 'circle'},
+                    'xaxis': 'x',
+                    'yaxis': 'y'
+                })
             
             if self.memory_forecast is not None and 'memory_usage_percent_forecast' in self.memory_forecast.columns:
-                fig.add_trace(
-                    go.Scatter(
-                        x=self.memory_forecast.index,
-                        y=self.memory_forecast['memory_usage_percent_forecast'],
-                        mode='lines+markers',
-                        name='Memory Forecast',
-                        line=dict(color='#4ecdc4', width=3),
-                        marker=dict(size=8, symbol='square')
-                    ),
-                    row=2, col=1
-                )
+                data.append({
+                    'type': 'scatter',
+                    'x': self.memory_forecast.index,
+                    'y': self.memory_forecast['memory_usage_percent_forecast'].values,
+                    'mode': 'lines+markers',
+                    'name': 'Memory Forecast',
+                    'line': {'color': '#4ecdc4', 'width': 3},
+                    'marker': {'size': 8, 'symbol': 'square'},
+                    'xaxis': 'x2',
+                    'yaxis': 'y2'
+                })
             
-            fig.update_layout(
-                title="Next 4 Hours Forecast",
-                height=600,
-                template='plotly_white',
-                showlegend=True
-            )
-            
-            fig.update_xaxes(title_text="Time", row=2, col=1)
-            fig.update_yaxes(title_text="CPU Usage (%)", row=1, col=1)
-            fig.update_yaxes(title_text="Memory Usage (%)", row=2, col=1)
-            
-            return fig
+            # Two stacked rows with a 0.1 gap, laid out by hand instead of make_subplots
+            subplot_title = {
+                'xref': 'paper', 'yref': 'paper', 'x': 0.5,
+                'xanchor': 'center', 'yanchor': 'bottom',
+                'showarrow': False, 'font': {'size': 16}
+            }
+            return {
+                'data': data,
+                'layout': {
+                    'title': {'text': "Next 4 Hours Forecast"},
+                    'height': 600,
+                    'template': 'plotly_white',
+                    'showlegend': True,
+                    'xaxis': {'domain': [0, 1], 'anchor': 'y'},
+                    'yaxis': {'domain': [0.55, 1], 'anchor': 'x', 'title': {'text': "CPU Usage (%)"}},
+                    'xaxis2': {'domain': [0, 1], 'anchor': 'y2', 'title': {'text': "Time (UTC)"}},
+                    'yaxis2': {'domain': [0, 0.45], 'anchor': 'x2', 'title': {'text': "Memory Usage (%)"}},
+                    'annotations': [
+                        dict(subplot_title, text='CPU Usage Forecast', y=1),
+                        dict(subplot_title, text='Memory Usage Forecast', y=0.45)
+                    ]
+                }
+            }
             
         except Exception as e:
             # Return empty figure if there's an error
-            fig = go.Figure()
-            fig.update_layout(
-                title="Forecast Chart - Error Loading",
-                annotations=[
-                    dict(
-                        text=f"Error: {str(e)}",
-                        xref="paper", yref="paper",
-                        x=0.5, y=0.5, xanchor='center', yanchor='middle',
-                        showarrow=False, font=dict(size=16)
-                    )
-                ]
-            )
-            return fig
+            return _error_figure("Forecast Chart - Error Loading", e)
+    
+    @st.fragment
+    def display_chart(self, metric_name, historical_col, forecast_data, color_hist, color_forecast):
+        """Render a combined chart as a fragment so it reruns without the rest of the page"""
+        chart = self.create_combined_chart(metric_name, historical_col, forecast_data, color_hist, color_forecast)
+        st.plotly_chart(chart, use_container_width=True)
+    
+    @st.fragment
+    def display_forecast_chart(self):
+        """Render the forecast-only chart as a fragment"""
+        forecast_chart = self.create_forecast_only_chart()
+        st.plotly_chart(forecast_chart, use_container_width=True)
     
     def display_metrics(self):
         """Display current metrics and model info"""
@@ -286,8 +373,8 @@ class DashboardApp:
         model_info = self.get_model_info()
         
         with col1:
-            if self.historical_data is not None:
-                latest_cpu = self.historical_data['cpu_usage_percent'].iloc[-1]
+            if self.latest_metrics is not None:
+                latest_cpu = self.latest_metrics['cpu_usage_percent']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>Current CPU USAGE</h3>
@@ -298,8 +385,8 @@ class DashboardApp:
                 st.metric("Current CPU Usage", "No Data", "")
         
         with col2:
-            if self.historical_data is not None:
-                latest_memory = self.historical_data['memory_usage_percent'].iloc[-1]
+            if self.latest_metrics is not None:
+                latest_memory = self.latest_metrics['memory_usage_percent']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>Current Memory Usage</h3>
@@ -314,7 +401,7 @@ class DashboardApp:
                 if (self.cpu_forecast is not None and 
                     'cpu_usage_percent_forecast' in self.cpu_forecast.columns and 
                     len(self.cpu_forecast) > 0):
-                    avg_cpu = self.cpu_forecast['cpu_usage_percent_forecast'].mean()
+                    avg_cpu = np.nanmean(self.cpu_forecast['cpu_usage_percent_forecast'].to_numpy())
                     st.markdown(f"""
                     <div class="forecast-card">
                         <h3>Forecasted CPU Usage (4hr avg)</h3>
@@ -331,7 +418,7 @@ class DashboardApp:
                 if (self.memory_forecast is not None and 
                     'memory_usage_percent_forecast' in self.memory_forecast.columns and 
                     len(self.memory_forecast) > 0):
-                    avg_memory = self.memory_forecast['memory_usage_percent_forecast'].mean()
+                    avg_memory = np.nanmean(self.memory_forecast['memory_usage_percent_forecast'].to_numpy())
                     st.markdown(f"""
                     <div class="forecast-card">
                         <h3>Forecasted Memory Usage(4hr avg)</h3>
@@ -355,7 +442,7 @@ class DashboardApp:
         models_exist = len(model_info) > 0
         
         # Check if historical data exists
-        if self.historical_data is None:
+        if self.latest_metrics is None:
             st.error("❌ **No historical data available**")
             st.markdown("""
             ### 🚀 **Getting Started**
@@ -410,7 +497,7 @@ class DashboardApp:
             # Show basic metrics without forecasts
             col1, col2 = st.columns(2)
             with col1:
-                latest_cpu = self.historical_data['cpu_usage_percent'].iloc[-1]
+                latest_cpu = self.latest_metrics['cpu_usage_percent']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>Current CPU Usage</h3>
@@ -419,7 +506,7 @@ class DashboardApp:
                 """, unsafe_allow_html=True)
             
             with col2:
-                latest_memory = self.historical_data['memory_usage_percent'].iloc[-1]
+                latest_memory = self.latest_metrics['memory_usage_percent']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>Current Memory Usage</h3>
@@ -431,24 +518,22 @@ class DashboardApp:
             tab1, tab2 = st.tabs(["📈 CPU History", "💾 Memory History"])
             
             with tab1:
-                cpu_chart = self.create_combined_chart(
+                self.display_chart(
                     "CPU Usage", 
                     "cpu_usage_percent", 
                     None,  # No forecast data
                     "#ff6b6b",
                     "#ff9999"
                 )
-                st.plotly_chart(cpu_chart, use_container_width=True)
             
             with tab2:
-                memory_chart = self.create_combined_chart(
+                self.display_chart(
                     "Memory Usage", 
                     "memory_usage_percent", 
                     None,  # No forecast data
                     "#4ecdc4",
                     "#7fdddd"
                 )
-                st.plotly_chart(memory_chart, use_container_width=True)
             
             return
         
@@ -463,30 +548,27 @@ class DashboardApp:
         
         with tab1:
             st.subheader("CPU Usage Analysis")
-            cpu_chart = self.create_combined_chart(
+            self.display_chart(
                 "CPU Usage", 
                 "cpu_usage_percent", 
                 self.cpu_forecast,
                 "#ff6b6b",  # Red for historical
                 "#ff9999"   # Light red for forecast
             )
-            st.plotly_chart(cpu_chart, use_container_width=True)
         
         with tab2:
             st.subheader("Memory Usage Analysis")
-            memory_chart = self.create_combined_chart(
+            self.display_chart(
                 "Memory Usage", 
                 "memory_usage_percent", 
                 self.memory_forecast,
                 "#4ecdc4",  # Teal for historical
                 "#7fdddd"   # Light teal for forecast
             )
-            st.plotly_chart(memory_chart, use_container_width=True)
         
         with tab3:
             st.subheader("Forecast Comparison")
-            forecast_chart = self.create_forecast_only_chart()
-            st.plotly_chart(forecast_chart, use_container_width=True)
+            self.display_forecast_chart()
         
         # Footer
         st.markdown("---")
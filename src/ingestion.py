@@ -7,13 +7,25 @@ from dotenv import load_dotenv
 # Load .env file
 load_dotenv()
 
+logger = Log.setup_logging()
+
+# InfluxDB field name -> CSV column name
+METRIC_NAMES = {
+    "usage_active": "cpu_usage_percent",
+    "used_percent": "memory_usage_percent",
+}
+CSV_COLUMNS = ["timestamp", "cpu_usage_percent", "memory_usage_percent"]
+RAW_DATA_PATH = "data/raw/system_metrics.parquet"
+# Pre-Parquet storage, read once so existing history carries over
+LEGACY_CSV_PATH = "data/raw/system_metrics.csv"
+
 class Ingestion:
     def __init__(self):
         """
         Initializes the Ingestion class with InfluxDB details and sets up logging.
         """
         try:
-            self.logger = Log.setup_logging()
+            self.logger = logger
 
             self.url = "http://localhost:8086"
             self.token = os.getenv("DOCKER_INFLUXDB_INIT_ADMIN_TOKEN")
@@ -29,30 +41,38 @@ class Ingestion:
 
     def load_csv(self):
         """
-        Checks if system_metrics.csv exists inside data/raw.
+        Checks if system_metrics.parquet exists inside data/raw.
         If yes, uses the latest timestamp as the starting point for new data.
         If not, fetches the last 1 hour of data.
         """
         try:
-            self.df_existing = pd.read_csv("data/raw/system_metrics.csv", parse_dates=["timestamp"])
-            last_timestamp = self.df_existing["timestamp"].max()
+            if os.path.exists(RAW_DATA_PATH):
+                self.df_existing = pd.read_parquet(RAW_DATA_PATH)
+            else:
+                self.df_existing = pd.read_csv(LEGACY_CSV_PATH, parse_dates=["timestamp"])
+            # Rows are only ever appended in timestamp order, so the last row is the newest
+            last_timestamp = self.df_existing["timestamp"].iloc[-1] if len(self.df_existing) else pd.NaT
 
             if pd.isna(last_timestamp):
-                self.logger.warning("CSV exists but no valid timestamp found. Pulling last 1 hour.", stacklevel=2)
+                self.logger.warning("Raw data exists but no valid timestamp found. Pulling last 1 hour.", stacklevel=2)
                 self.last_timestamp = "-1h"
+                self.last_timestamp_pd = None
             else:
                 self.logger.info(f"Last saved timestamp: {last_timestamp}", stacklevel=2)
                 self.last_timestamp = last_timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
+                self.last_timestamp_pd = last_timestamp
 
         except FileNotFoundError:
-            self.logger.warning("No existing CSV found, pulling last 1 hour of data.", stacklevel=2)
+            self.logger.warning("No existing raw data found, pulling last 1 hour of data.", stacklevel=2)
             self.last_timestamp = "-1h"
+            self.last_timestamp_pd = None
             self.df_existing = pd.DataFrame()
 
     def create_csv(self):
         """
         Queries InfluxDB for CPU and RAM usage data,
-        appends new records to system_metrics.csv or creates it if not present.
+        appends new records to system_metrics.parquet or creates it if not present.
+        Returns the full raw DataFrame.
         """
         query = f'''
         from(bucket: "{self.bucket}")
@@ -64,36 +84,41 @@ class Ingestion:
 
         try:
             query_api = self.client.query_api()
-            tables = query_api.query(query, org=self.org)
-
-            data = []
-            for table in tables:
-                for record in table.records:
-                    data.append({
-                        "timestamp": record.get_time(),
-                        "metric": "cpu_usage_percent" if record.get_field() == "usage_active" else "memory_usage_percent",
-                        "value": record.get_value()
-                    })
-
-            df_new = pd.DataFrame(data)
+            # Stream chunk by chunk, keeping only the needed columns of each
+            frames = [
+                chunk[["_time", "_field", "_value"]]
+                for chunk in query_api.query_data_frame_stream(query, org=self.org)
+                if not chunk.empty
+            ]
+            df_new = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
             if not df_new.empty:
-                df_pivot = df_new.pivot(index='timestamp', columns='metric', values='value').reset_index()
-                df_pivot.sort_values('timestamp', inplace=True)
-
-                try:
-                    df_existing = pd.read_csv("data/raw/system_metrics.csv", parse_dates=["timestamp"])
-                    df_combined = pd.concat([df_existing, df_pivot], ignore_index=True)
-                    df_combined.drop_duplicates(subset=['timestamp'], keep='last', inplace=True)
-                    df_combined.sort_values("timestamp", inplace=True)
-                except FileNotFoundError:
-                    df_combined = df_pivot
-
-                df_combined.to_csv("data/raw/system_metrics.csv", index=False)
-                self.logger.info(f"{len(df_pivot)} new rows appended to system_metrics.csv", stacklevel=2)
+                df_new = df_new.rename(columns={"_time": "timestamp", "_field": "metric", "_value": "value"})
+                # Percentages need no more than float32, and two metric names hash faster as categories
+                df_new["metric"] = df_new["metric"].map(METRIC_NAMES).astype("category")
+                df_new["value"] = df_new["value"].astype("float32")
+                df_new = df_new[["timestamp", "metric", "value"]]
+
+                # One value per (timestamp, metric), so a direct unstack reshapes without a groupby
+                df_pivot = df_new.set_index(['timestamp', 'metric'])['value'].unstack().sort_index()
+                df_pivot.columns = df_pivot.columns.astype(str)
+                df_pivot = df_pivot.reset_index().reindex(columns=CSV_COLUMNS)
+
+                # The Flux range start is inclusive, so drop rows already stored
+                if self.last_timestamp_pd is not None:
+                    df_pivot = df_pivot[df_pivot['timestamp'] > self.last_timestamp_pd]
+
+                # Parquet can't be appended to, but existing rows are already in
+                # memory from load_csv and all older, so no re-read or dedup is needed
+                df_combined = pd.concat([self.df_existing, df_pivot], ignore_index=True)
+                os.makedirs(os.path.dirname(RAW_DATA_PATH), exist_ok=True)
+                df_combined.to_parquet(RAW_DATA_PATH, compression='snappy', index=False)
+                self.logger.info(f"{len(df_pivot)} new rows appended to system_metrics.parquet", stacklevel=2)
+                return df_combined
 
             else:
                 self.logger.info("No new data found in InfluxDB.", stacklevel=2)
+                return self.df_existing
 
         except Exception as e:
             self.logger.error(f"Failed during create_csv execution: {e}", stacklevel=2)
@@ -103,7 +128,14 @@ class Ingestion:
             self.client.close()
             self.logger.info("InfluxDB client connection closed.", stacklevel=2)
 
-if __name__ == '__main__':
+def main():
+    """
+    Runs ingestion and returns the full raw DataFrame.
+    """
     ingestion_obj = Ingestion()
     ingestion_obj.load_csv()
-    ingestion_obj.create_csv()
+    return ingestion_obj.create_csv()
+
+if __name__ == '__main__':
+    main()
+
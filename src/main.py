@@ -11,49 +11,50 @@ Usage:
     python src/main.py
 """
 
-import subprocess
 import sys
+from src import ingestion, pre_processing, model_train, model_inference
 from src.logger_setup import Log
 
-def run_script(script_name):
+logger = Log.setup_logging()
+
+def run_stage(name, func, *args):
     """
-    Run a Python script and return success/failure
+    Run a pipeline stage in-process and return (success, result)
     """
-    logger = Log.setup_logging()
-    
     try:
-        logger.info(f"Running {script_name}...", stacklevel=2)
-        result = subprocess.run([sys.executable, f"src/{script_name}"], 
-                              check=True, 
-                              capture_output=True, 
-                              text=True)
-        logger.info(f"{script_name} completed successfully", stacklevel=2)
-        return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"{script_name} failed with exit code {e.returncode}", stacklevel=2)
-        logger.error(f"Error output: {e.stderr}", stacklevel=2)
-        return False
+        logger.info(f"Running {name}...", stacklevel=2)
+        result = func(*args)
+        logger.info(f"{name} completed successfully", stacklevel=2)
+        return True, result
+    except Exception as e:
+        logger.exception(f"{name} failed: {e}", stacklevel=2)
+        return False, None
 
 def main():
     """
-    Run the complete pipeline
+    Run the complete pipeline in a single process
     """
-    logger = Log.setup_logging()
     logger.info("Starting Time-Series Forecasting Pipeline", stacklevel=2)
     
-    scripts = [
-        "ingestion.py",
-        "pre_processing.py", 
-        "model_train.py",
-        "model_inference.py"
+    stages = [
+        ("ingestion", ingestion.main),
+        ("pre_processing", pre_processing.main),
+        ("model_train", model_train.main),
+        ("model_inference", model_inference.main)
     ]
     
-    for script in scripts:
-        if not run_script(script):
-            logger.error(f"Pipeline failed at {script}", stacklevel=2)
+    raw_df = None
+    for name, func in stages:
+        # Hand the ingested frame straight to pre-processing instead of re-reading it
+        args = (raw_df,) if name == "pre_processing" else ()
+        ok, result = run_stage(name, func, *args)
+        if not ok:
+            logger.error(f"Pipeline failed at {name}", stacklevel=2)
             sys.exit(1)
+        if name == "ingestion":
+            raw_df = result
     
     logger.info("Pipeline completed successfully", stacklevel=2)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,30 +1,64 @@
 """
 Model Inference Script
 
-This script loads and uses the trained SARIMA models that were saved as pickle files.
+This script loads and uses the trained SARIMA models that were saved as .npz state files.
 Simple, fast, and automatically gets the latest trained models.
 """
 
 import os
 import pickle
+import numpy as np
 import pandas as pd
 import warnings
 from datetime import datetime
+from functools import lru_cache
+from statsmodels.tsa.statespace.sarimax import SARIMAX
 from src.logger_setup import Log
 
 # Suppress all warnings for cleaner output during inference
 warnings.simplefilter('ignore')
 
+logger = Log.setup_logging()
+
+@lru_cache(maxsize=8)
+def _load_model_file(model_path, mod_time):
+    """
+    Rebuild a SARIMA results object from its artifact. Cached per process;
+    mod_time is part of the key so retraining invalidates the entry.
+    """
+    if model_path.endswith(".pkl"):
+        with open(model_path, "rb") as f:
+            return pickle.load(f)
+    
+    with np.load(model_path) as state:
+        sarimax = SARIMAX(
+            state["endog"],
+            order=tuple(int(x) for x in state["order"]),
+            seasonal_order=tuple(int(x) for x in state["seasonal_order"])
+        )
+        # Run the Kalman filter once here; forecast() then only steps forward
+        # from the final filtered state. The backward smoother pass isn't needed.
+        return sarimax.filter(state["params"])
+
 class ModelInference:
-    def __init__(self):
-        self.logger = Log.setup_logging()
+    def __init__(self, allow_pickle=False):
+        """
+        allow_pickle enables loading legacy *_sarima_model.pkl files when no
+        .npz state exists. Unpickling runs arbitrary code, so it is opt-in.
+        """
+        self.logger = logger
+        self.allow_pickle = allow_pickle
         
     def load_model(self, model_name):
         """
-        Load the latest trained SARIMA model from pickle file
+        Load the latest trained SARIMA model from its .npz state file
         """
         try:
-            model_path = f"artifacts/{model_name}_sarima_model.pkl"
+            model_path = f"artifacts/{model_name}_sarima.npz"
+            legacy_path = f"artifacts/{model_name}_sarima_model.pkl"
+            
+            if not os.path.exists(model_path) and self.allow_pickle and os.path.exists(legacy_path):
+                model_path = legacy_path
             
             if not os.path.exists(model_path):
                 raise FileNotFoundError(f"No SARIMA model file found for {model_name}: {model_path}")
@@ -32,9 +66,8 @@ class ModelInference:
             mod_time = os.path.getmtime(model_path)
             mod_datetime = datetime.fromtimestamp(mod_time)
             
-            with open(model_path, "rb") as f:
-                model = pickle.load(f)
-                
+            model = _load_model_file(model_path, mod_time)
+            
             self.logger.info(f"Loaded SARIMA model: {model_path} (trained: {mod_datetime})", stacklevel=2)
             return model, mod_datetime
             
@@ -64,7 +97,12 @@ class ModelInference:
                 self.logger.warning("No artifacts directory found. Run model training first.", stacklevel=2)
                 return []
             
-            model_files = [f for f in os.listdir(artifacts_dir) if f.endswith('_sarima_model.pkl')]
+            # DirEntry caches its stat result, so each file is stat'ed at most once
+            with os.scandir(artifacts_dir) as entries:
+                model_files = sorted(
+                    (entry for entry in entries if entry.name.endswith('_sarima.npz')),
+                    key=lambda entry: entry.name
+                )
             
             if not model_files:
                 self.logger.warning("No trained SARIMA models found. Run model training first.", stacklevel=2)
@@ -73,12 +111,11 @@ class ModelInference:
             self.logger.info("Available Trained SARIMA Models:", stacklevel=2)
             models_info = []
             
-            for model_file in sorted(model_files):
-                model_path = os.path.join(artifacts_dir, model_file)
-                mod_time = os.path.getmtime(model_path)
-                mod_datetime = datetime.fromtimestamp(mod_time)
+            for entry in model_files:
+                model_file = entry.name
+                mod_datetime = datetime.fromtimestamp(entry.stat().st_mtime)
                 
-                model_name = model_file.replace('_sarima_model.pkl', '')
+                model_name = model_file.replace('_sarima.npz', '')
                 self.logger.info(f"  {model_name} - Trained: {mod_datetime.strftime('%Y-%m-%d %H:%M:%S')} - File: {model_file}", stacklevel=2)
                 
                 models_info.append({
@@ -106,10 +143,10 @@ class ModelInference:
             
             self.logger.info(f"{display_name} model trained: {trained_at.strftime('%Y-%m-%d %H:%M:%S')}", stacklevel=2)
             hours = (steps * 5) / 60
-            self.logger.info(f"{display_name} forecast for next {hours:.1f} hours ({steps * 5} minutes):", stacklevel=2)
-            
-            for i, value in enumerate(forecast):
-                self.logger.info(f"  Step {i+1} (+{(i+1)*5} min): {value:.2f}%", stacklevel=2)
+            # One multi-line record instead of one record per step
+            lines = [f"{display_name} forecast for next {hours:.1f} hours ({steps * 5} minutes):"]
+            lines += [f"  Step {i+1} (+{(i+1)*5} min): {value:.2f}%" for i, value in enumerate(forecast)]
+            self.logger.info("\n".join(lines))
                 
             return forecast, trained_at
             
@@ -117,9 +154,10 @@ class ModelInference:
             self.logger.error(f"{metric_name} model failed: {e}", stacklevel=2)
             return None, None
 
-    def run_inference(self):
+    def run_inference(self, verbose=False):
         """
-        Run inference on both CPU and memory models (optimized version)
+        Run inference on both CPU and memory models (optimized version).
+        verbose also lists every available model file before forecasting.
         """
         self.logger.info("Starting model inference demonstration", stacklevel=2)
         
@@ -129,20 +167,28 @@ class ModelInference:
             return
         
         # Show available models for information
-        self.logger.info("Checking available models...", stacklevel=2)
-        self.list_available_models()
+        if verbose:
+            self.logger.info("Checking available models...", stacklevel=2)
+            self.list_available_models()
         
         self.logger.info("Running predictions with latest models", stacklevel=2)
         
         # Use generic method for both metrics (eliminates code duplication)
         metrics = ["cpu_usage_percent", "memory_usage_percent"]
         
+        trained = {}
         for metric in metrics:
-            self.forecast_metric(metric, steps=48)
+            _, trained_at = self.forecast_metric(metric, steps=48)
+            if trained_at is not None:
+                trained[metric] = trained_at.strftime('%Y-%m-%d %H:%M:%S')
         
-        self.logger.info("Inference completed successfully", stacklevel=2)
+        self.logger.info(f"Inference completed successfully (models trained: {trained})", stacklevel=2)
         self.logger.info("To retrain models with new data, run: python src/model_train.py", stacklevel=2)
 
-if __name__ == "__main__":
+def main():
     inference = ModelInference()
-    inference.run_inference() 
\ No newline at end of file
+    inference.run_inference()
+
+if __name__ == "__main__":
+    main()
+ 
\ No newline at end of file
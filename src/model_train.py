@@ -6,19 +6,20 @@ This script:
 - Fits SARIMA (Seasonal ARIMA) models for CPU and memory usage separately
 - Forecasts the next 4 hours (48 steps at 5-min intervals)
 - Logs metrics and artifacts to MLflow for tracking and visualization
-- Saves models as pickle files for inference
+- Saves model state (params, endog, orders) as .npz files for inference
 
 '''
 
 import os
 import pandas as pd
-import pickle
 import warnings
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tsa.stattools import adfuller
 from statsmodels.stats.diagnostic import acorr_ljungbox
 import numpy as np
 from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from joblib import Parallel, delayed
 from src.logger_setup import Log
 import mlflow
 import mlflow.pyfunc
@@ -31,11 +32,69 @@ warnings.filterwarnings('ignore', message='No supported index is available')
 warnings.filterwarnings('ignore', message='.*index.*', module='statsmodels')
 warnings.filterwarnings('ignore', message='.*frequency.*', module='statsmodels')
 
+logger = Log.setup_logging()
+
+MLFLOW_TRACKING_URI = "file:./mlruns"
+
+def _fit_candidate(series, order, seasonal_order):
+    """
+    Fit one grid-search candidate in a worker process.
+    Returns (score, order, seasonal_order, 5-step test forecast), or None if the fit fails.
+    """
+    try:
+        model = SARIMAX(series, order=order, seasonal_order=seasonal_order)
+        # Selection only needs the AIC and a short forecast: cap iterations, skip
+        # stored states and the covariance (Hessian) step. The winner is refit in full.
+        fitted_model = model.fit(disp=False, method='lbfgs', maxiter=30, low_memory=True, cov_type='none')
+        
+        # Test forecast to ensure it's reasonable (raw values only, no index to ship back)
+        test_forecast = np.asarray(fitted_model.forecast(steps=5), dtype=np.float64)
+    except Exception:
+        return None
+    
+    p, d, q = order
+    P, D, Q, s = seasonal_order
+    
+    # Use AIC with reduced penalty to allow more complex seasonal models
+    penalty = (p + q + P + Q) * 2  # Reduced penalty to allow seasonal patterns
+    
+    # Bonus for models with seasonal components (encourage non-flat forecasts)
+    seasonal_bonus = 0
+    if P > 0 and Q > 0:  # Has both seasonal AR and MA components
+        seasonal_bonus = -15  # Strong bonus for full seasonal models
+    elif P > 0 or Q > 0:  # Has at least one seasonal component
+        seasonal_bonus = -10  # Moderate bonus
+    
+    return fitted_model.aic + penalty + seasonal_bonus, order, seasonal_order, test_forecast
+
+def _check_test_forecast(test_forecast, data_min, data_max):
+    """
+    Return why a short test forecast is unusable, or None if it looks reasonable.
+    Works on a raw float64 array to skip pandas dispatch on these tiny inputs.
+    """
+    test_forecast = np.asarray(test_forecast, dtype=np.float64)
+    data_range = data_max - data_min
+    
+    # Check if forecast is reasonable (within 3x the data range for more flexibility)
+    forecast_min, forecast_max = float(test_forecast.min()), float(test_forecast.max())
+    
+    # Reject if forecast is way outside reasonable bounds (more lenient)
+    if (forecast_min < data_min - 2*data_range or 
+        forecast_max > data_max + 2*data_range):
+        return f"unrealistic forecast range: {forecast_min:.1f} to {forecast_max:.1f}"
+    
+    # Reject flat forecasts (all values too similar)
+    forecast_std = float(test_forecast.std(ddof=1))
+    if forecast_std < 0.1:  # If standard deviation is too low, it's essentially flat
+        return f"flat forecast (std: {forecast_std:.3f})"
+    
+    return None
+
 class SARIMAForecaster:
     def __init__(self, file_path, forecast_steps=48):
         self.file_path = file_path
         self.forecast_steps = forecast_steps
-        self.logger = Log.setup_logging()
+        self.logger = logger
     
     def check_stationarity(self, series):
         """
@@ -51,13 +110,16 @@ class SARIMAForecaster:
             self.logger.warning(f"Stationarity test failed: {e}", stacklevel=2)
             return False, 1.0
     
-    def find_best_sarima_params(self, series, max_p=2, max_d=1, max_q=2, seasonal_periods=12):
+    def find_best_sarima_params(self, series, max_p=2, max_d=1, max_q=2, seasonal_periods=12, n_jobs=-1):
         """
         Find best SARIMA parameters using grid search with AIC and forecast validation
         """
         try:
             self.logger.info("Searching for optimal SARIMA parameters...", stacklevel=2)
             
+            # Plain floats, computed once for every candidate's validation
+            data_min, data_max = float(series.min()), float(series.max())
+            
             # Check if differencing is needed
             is_stationary, p_value = self.check_stationarity(series)
             d_range = [0] if is_stationary else [0, 1]
@@ -73,56 +135,39 @@ class SARIMAForecaster:
             
             self.logger.info(f"Testing SARIMA models with seasonal period = {seasonal_periods} (12 * 5min = 1 hour)", stacklevel=2)
             
-            for (p, d, q) in non_seasonal_combinations:
-                if p == 0 and d == 0 and q == 0:
-                    continue  # Skip (0,0,0)
+            candidates = [
+                ((p, d, q), (P, D, Q, seasonal_periods))
+                for (p, d, q) in non_seasonal_combinations
+                if not (p == 0 and d == 0 and q == 0)  # Skip (0,0,0)
+                for (P, D, Q) in seasonal_combinations
+            ]
+            # Dispatch the biggest state spaces (slowest fits) first so no worker is
+            # left finishing one long fit after the rest of the pool has gone idle
+            candidates.sort(key=lambda c: -(sum(c[0]) + sum(c[1][:3]) * seasonal_periods))
+            
+            # Each fit is an independent, compute-bound MLE, so spread them across cores
+            results = Parallel(n_jobs=n_jobs, prefer="processes")(
+                delayed(_fit_candidate)(series, order, seasonal_order)
+                for order, seasonal_order in candidates
+            )
+            
+            # Validate in score order: the first candidate that passes is the best,
+            # so dominated candidates are never checked. NaN scores are dropped first:
+            # they compare false against everything and would break the ordering
+            scored = sorted(
+                (result for result in results if result is not None and np.isfinite(result[0])),
+                key=lambda result: result[0]
+            )
+            
+            for score, order, seasonal_order, test_forecast in scored:
+                rejection = _check_test_forecast(test_forecast, data_min, data_max)
+                if rejection:
+                    self.logger.info(f"Rejecting SARIMA{order}x{seasonal_order} - {rejection}", stacklevel=2)
+                    continue
                 
-                for (P, D, Q) in seasonal_combinations:
-                    try:
-                        order = (p, d, q)
-                        seasonal_order = (P, D, Q, seasonal_periods)
-                        
-                        model = SARIMAX(series, order=order, seasonal_order=seasonal_order)
-                        fitted_model = model.fit(disp=False)
-                        
-                        # Test forecast to ensure it's reasonable
-                        test_forecast = fitted_model.forecast(steps=5)
-                        
-                        # Check if forecast is reasonable (within 3x the data range for more flexibility)
-                        data_min, data_max = series.min(), series.max()
-                        data_range = data_max - data_min
-                        forecast_min, forecast_max = test_forecast.min(), test_forecast.max()
-                        
-                        # Reject if forecast is way outside reasonable bounds (more lenient)
-                        if (forecast_min < data_min - 2*data_range or 
-                            forecast_max > data_max + 2*data_range):
-                            self.logger.info(f"Rejecting SARIMA{order}x{seasonal_order} - unrealistic forecast range: {forecast_min:.1f} to {forecast_max:.1f}", stacklevel=2)
-                            continue
-                        
-                        # Reject flat forecasts (all values too similar)
-                        forecast_std = test_forecast.std()
-                        if forecast_std < 0.1:  # If standard deviation is too low, it's essentially flat
-                            self.logger.info(f"Rejecting SARIMA{order}x{seasonal_order} - flat forecast (std: {forecast_std:.3f})", stacklevel=2)
-                            continue
-                        
-                        # Use AIC with reduced penalty to allow more complex seasonal models
-                        penalty = (p + q + P + Q) * 2  # Reduced penalty to allow seasonal patterns
-                        
-                        # Bonus for models with seasonal components (encourage non-flat forecasts)
-                        seasonal_bonus = 0
-                        if P > 0 and Q > 0:  # Has both seasonal AR and MA components
-                            seasonal_bonus = -15  # Strong bonus for full seasonal models
-                        elif P > 0 or Q > 0:  # Has at least one seasonal component
-                            seasonal_bonus = -10  # Moderate bonus
-                        
-                        score = fitted_model.aic + penalty + seasonal_bonus
-                        
-                        if score < best_score:
-                            best_score = score
-                            best_params = (order, seasonal_order)
-                            
-                    except Exception as e:
-                        continue  # Skip problematic parameter combinations
+                best_score = score
+                best_params = (order, seasonal_order)
+                break
             
             order, seasonal_order = best_params
             self.logger.info(f"Best SARIMA parameters: {order}x{seasonal_order} (Score: {best_score:.2f})", stacklevel=2)
@@ -134,40 +179,44 @@ class SARIMAForecaster:
 
     def load_data(self):
         try:
-            self.df = pd.read_csv(self.file_path, index_col='timestamp', parse_dates=True)
-            # Try to infer frequency, fallback to None if not regular
+            # One float64 block: pandas stores it column by column, so each metric
+            # column is already a contiguous float64 array when handed to SARIMAX
+            self.df = pd.read_parquet(self.file_path).astype(np.float64)
+            # Infer frequency once (train_and_forecast reuses it), fallback to None if not regular
             try:
-                self.df.index.freq = pd.infer_freq(self.df.index)
-                if self.df.index.freq is None:
-                    self.df.index.freq = '5min'
+                self.df.index.freq = pd.infer_freq(self.df.index) or '5min'
             except:
                 self.df.index.freq = None
+            self._freq = self.df.index.freq
             self.logger.info(f"Loaded preprocessed data from {self.file_path}", stacklevel=2)
         except Exception as e:
             self.logger.critical(f"Failed to load data: {e}", stacklevel=2)
             raise
 
-    def train_and_forecast(self, column_name):
+    def train_and_forecast(self, column_name, n_jobs=-1):
         """
         Train SARIMA and forecast for a specific column, log to MLflow.
+        n_jobs is passed through to the parallel grid search.
         """
         try:
             y = self.df[column_name].dropna()
-            # Try to set frequency for statsmodels, but don't fail if it can't be inferred
+            # statsmodels' state-space filter runs in float64 regardless of input dtype, so a
+            # float32 series would only be upcast again. Hand it C-contiguous float64 instead,
+            # which every SARIMAX(y, ...) in the search can use without copying.
+            y = pd.Series(np.ascontiguousarray(y.to_numpy(dtype=np.float64)), index=y.index, name=column_name)
+            # Reuse the frequency from load_data for statsmodels, but don't fail if it doesn't fit
             try:
-                if y.index.freq is None:
-                    inferred_freq = pd.infer_freq(y.index)
-                    if inferred_freq:
-                        y.index.freq = inferred_freq
+                if y.index.freq is None and self._freq is not None:
+                    y.index.freq = self._freq
             except:
-                # If frequency setting fails, continue without it
+                # Dropped NaN rows can leave gaps; continue without a frequency
                 pass
             self.logger.info(f"Training SARIMA for {column_name}...", stacklevel=2)
 
             with mlflow.start_run(run_name=f"SARIMA_{column_name}") as run:
                 # Find optimal SARIMA parameters
                 # Use 12 as seasonal period (12 * 5min = 1 hour cycle)
-                best_params = self.find_best_sarima_params(y, seasonal_periods=12)
+                best_params = self.find_best_sarima_params(y, seasonal_periods=12, n_jobs=n_jobs)
                 order, seasonal_order = best_params
                 p, d, q = order
                 P, D, Q, s = seasonal_order
@@ -192,8 +241,7 @@ class SARIMAForecaster:
                     self.logger.info(f"SARIMA{order}x{seasonal_order} model fitted successfully for {column_name}", stacklevel=2)
                     
                     # Log model quality metrics
-                    mlflow.log_metric("aic", model_fit.aic)
-                    mlflow.log_metric("bic", model_fit.bic)
+                    mlflow.log_metrics({"aic": model_fit.aic, "bic": model_fit.bic})
                     
                 except Exception as fit_error:
                     self.logger.error(f"SARIMA{order}x{seasonal_order} fitting failed for {column_name}: {fit_error}", stacklevel=2)
@@ -215,26 +263,41 @@ class SARIMAForecaster:
                     f.write(model_summary)
                 mlflow.log_artifact(summary_path)
 
-                # Save the trained model as pickle
-                model_path = os.path.join(artifact_dir, f"{column_name}_sarima_model.pkl")
-                with open(model_path, "wb") as f:
-                    pickle.dump(model_fit, f)
+                # Save the model state as plain arrays; inference rebuilds the
+                # results with SARIMAX(endog, ...).filter(params) instead of unpickling
+                model_path = os.path.join(artifact_dir, f"{column_name}_sarima.npz")
+                np.savez_compressed(
+                    model_path,
+                    params=np.asarray(model_fit.params, dtype=np.float64),
+                    endog=np.asarray(y.values, dtype=np.float64),
+                    order=np.array(model_fit.model.order),
+                    seasonal_order=np.array(model_fit.model.seasonal_order)
+                )
                 mlflow.log_artifact(model_path)
 
                 # Also log the model using MLflow's generic model logging
+                # The wrapper carries no fitted results: the npz state is logged as a model
+                # artifact and rebuilt in load_context, so MLflow doesn't pickle every
+                # filter/smoother array of model_fit into the pyfunc model
                 class SARIMAWrapper(mlflow.pyfunc.PythonModel):
-                    def __init__(self, model):
-                        self.model = model
+                    def load_context(self, context):
+                        with np.load(context.artifacts["model_state"]) as state:
+                            sarimax = SARIMAX(
+                                state["endog"],
+                                order=tuple(int(x) for x in state["order"]),
+                                seasonal_order=tuple(int(x) for x in state["seasonal_order"])
+                            )
+                            self.model = sarimax.filter(state["params"])
                     
                     def predict(self, context, model_input):
                         # model_input should be number of steps to forecast
                         steps = model_input.iloc[0, 0] if hasattr(model_input, 'iloc') else model_input
                         return self.model.forecast(steps=int(steps))
                 
-                wrapped_model = SARIMAWrapper(model_fit)
                 mlflow.pyfunc.log_model(
                     artifact_path=f"{column_name}_model",
-                    python_model=wrapped_model,
+                    python_model=SARIMAWrapper(),
+                    artifacts={"model_state": model_path},
                     registered_model_name=f"SARIMA_{column_name}"
                 )
 
@@ -262,12 +325,17 @@ class SARIMAForecaster:
                 forecast_series = pd.Series(forecast_values, index=forecast_index)
 
                 hours = (self.forecast_steps * 5) / 60
-                self.logger.info(f"Forecast for {column_name} for next {hours:.1f} hours ({self.forecast_steps * 5} minutes):", stacklevel=2)
-                for i, (timestamp, value) in enumerate(forecast_series.items()):
-                    if pd.isna(value):
-                        self.logger.warning(f"  Step {i+1}: {timestamp} -> NaN (model failed to predict)", stacklevel=2)
-                    else:
-                        self.logger.info(f"  Step {i+1}: {timestamp} -> {value:.2f}%", stacklevel=2)
+                # One multi-line record instead of one record per step
+                lines = [f"Forecast for {column_name} for next {hours:.1f} hours ({self.forecast_steps * 5} minutes):"]
+                lines += [
+                    f"  Step {i+1}: {timestamp} -> NaN (model failed to predict)" if pd.isna(value)
+                    else f"  Step {i+1}: {timestamp} -> {value:.2f}%"
+                    for i, (timestamp, value) in enumerate(forecast_series.items())
+                ]
+                self.logger.info("\n".join(lines))
+                nan_steps = [i + 1 for i, value in enumerate(forecast_values) if pd.isna(value)]
+                if nan_steps:
+                    self.logger.warning(f"Forecast for {column_name} has NaN at steps {nan_steps}; they are left out of the MLflow metrics")
 
                 # Log forecast CSV as artifact with confidence intervals
                 forecast_df = forecast_series.reset_index()
@@ -281,12 +349,12 @@ class SARIMAForecaster:
                 forecast_df.to_csv(csv_path, index=False)
                 mlflow.log_artifact(csv_path)
 
-                # Log final forecasted values as metrics (skip NaN values)
-                for idx, val in enumerate(forecast_series.values):
-                    if not pd.isna(val):  # Only log non-NaN values
-                        mlflow.log_metric(f"{column_name}_forecast_step_{idx+1}", val)
-                    else:
-                        self.logger.warning(f"Skipping NaN forecast value for {column_name} step {idx+1}", stacklevel=2)
+                # Log final forecasted values as metrics in one batch (skip NaN values)
+                mlflow.log_metrics({
+                    f"{column_name}_forecast_step_{idx+1}": float(val)
+                    for idx, val in enumerate(forecast_values)
+                    if not pd.isna(val)
+                })
 
                 self.logger.info(f"Forecasting and logging complete for {column_name}", stacklevel=2)
 
@@ -296,10 +364,20 @@ class SARIMAForecaster:
             self.logger.critical(f"Failed ARIMA forecast for {column_name}: {e}", stacklevel=2)
             raise
 
-if __name__ == "__main__":
+def _init_mlflow(tracking_uri, experiment_name):
+    """
+    Point a training worker process at the same MLflow store and experiment.
+    """
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment_name)
+
+def main():
+    """
+    Trains CPU and memory SARIMA models and returns their forecasts.
+    """
     # Set MLflow tracking URI to use local file system instead of remote server
     # This avoids permission issues with containerized MLflow
-    mlflow.set_tracking_uri("file:./mlruns")
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     experiment_name = "SARIMA_Forecasting"
     
     # Create experiment with local artifact location
@@ -310,20 +388,39 @@ if __name__ == "__main__":
                 experiment_name, 
                 artifact_location="./artifacts"
             )
-            Log.setup_logging().info(f"Created new experiment: {experiment_name}", stacklevel=2)
+            logger.info(f"Created new experiment: {experiment_name}", stacklevel=2)
         mlflow.set_experiment(experiment_name)
     except Exception as e:
-        Log.setup_logging().warning(f"Using default experiment due to: {e}", stacklevel=2)
+        logger.warning(f"Using default experiment due to: {e}", stacklevel=2)
         mlflow.set_experiment(experiment_name)
 
     forecaster = SARIMAForecaster(
-        file_path="data/preprocessed/system_metrics_preprocessed.csv",
+        file_path="data/preprocessed/system_metrics_preprocessed.parquet",
         forecast_steps=48  # forecasting next 4 hours at 5-min intervals
     )
 
     forecaster.load_data()
 
-    cpu_forecast = forecaster.train_and_forecast('cpu_usage_percent')
-    mem_forecast = forecaster.train_and_forecast('memory_usage_percent')
+    # The two models are independent, compute-bound fits, so train them side by side.
+    # The initializer repeats the MLflow setup in case workers are spawned, not forked.
+    columns = ['cpu_usage_percent', 'memory_usage_percent']
+    # Each worker runs its own parallel grid search, so split the cores between them
+    # instead of letting both claim all of them
+    n_jobs = max(1, (os.cpu_count() or 1) // len(columns))
+    with ProcessPoolExecutor(
+        max_workers=len(columns),
+        initializer=_init_mlflow,
+        initargs=(MLFLOW_TRACKING_URI, experiment_name)
+    ) as executor:
+        futures = {column: executor.submit(forecaster.train_and_forecast, column, n_jobs) for column in columns}
+        forecasts = {column: future.result() for column, future in futures.items()}
+
+    cpu_forecast = forecasts['cpu_usage_percent']
+    mem_forecast = forecasts['memory_usage_percent']
 
-    Log.setup_logging().info("Forecasting completed successfully", stacklevel=2)
\ No newline at end of file
+    logger.info("Forecasting completed successfully", stacklevel=2)
+
+    return cpu_forecast, mem_forecast
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,18 @@
 This module implements simple pre-processing for time series data:
 
 Handle NaNs (forward fill + backfill if needed).
-Convert timestamp to datetime index.
-Save cleaned data to data/preprocessed/ folder.
+Use the (already typed) timestamp column as the index.
+Save cleaned data to data/preprocessed/ folder as Parquet.
 """
 
 import pandas as pd
 import os
 from src.logger_setup import Log
 
+logger = Log.setup_logging()
+
+PARQUET_ROW_GROUP_SIZE = 10_000
+
 class PreProcessor:
     def __init__(self, input_file, output_file):
         """
@@ -17,15 +21,16 @@ class PreProcessor:
         """
         self.input_file = input_file
         self.output_file = output_file
-        self.logger = Log.setup_logging()
+        self.logger = logger
         self.df = None
 
     def load_data(self):
         """
-        Load CSV into DataFrame.
+        Load raw Parquet data into DataFrame, indexed by timestamp.
+        Parquet stores typed timestamps, so nothing needs re-parsing.
         """
         try:
-            self.df = pd.read_csv(self.input_file)
+            self.df = pd.read_parquet(self.input_file, engine="pyarrow").set_index("timestamp")
             self.logger.info(f"Loaded data from {self.input_file}", stacklevel=2)
         except FileNotFoundError:
             self.logger.critical(f"Input file {self.input_file} not found.", stacklevel=2)
@@ -34,18 +39,28 @@ class PreProcessor:
     def process(self):
         """
         Pre-process:
-        - Parse timestamp
-        - Set as index
+        - Set timestamp as index (if not done on load)
         - Handle NaNs
         """
         try:
-            self.df['timestamp'] = pd.to_datetime(self.df['timestamp'])
-            self.df.set_index('timestamp', inplace=True)
-            self.df.sort_index(inplace=True)
+            # Fail here rather than write an empty parquet that only breaks training later
+            if self.df is None or self.df.empty:
+                raise ValueError("No raw data to pre-process")
+            if 'timestamp' in self.df.columns:
+                self.df.set_index('timestamp', inplace=True)
+            # Ingestion writes rows in order, so this is normally just a check
+            if not self.df.index.is_monotonic_increasing:
+                self.df.sort_index(inplace=True)
+
+            # Handle NaNs with forward fill, then backfill for initial NaNs,
+            # touching only the columns that actually have gaps
+            cols_with_na = self.df.columns[self.df.isna().any()]
+            if len(cols_with_na) > 0:
+                self.df[cols_with_na] = self.df[cols_with_na].ffill().bfill()
 
-            # Handle NaNs with forward fill, then backfill for initial NaNs
-            self.df.ffill(inplace=True)
-            self.df.bfill(inplace=True)
+            # Percentages don't need float64; every downstream reader gets half the bytes
+            for col in self.df.select_dtypes(include="float").columns:
+                self.df[col] = pd.to_numeric(self.df[col], downcast="float")
 
             self.logger.info("Pre-processing completed: timestamp indexed and NaNs handled.", stacklevel=2)
         except Exception as e:
@@ -58,17 +73,29 @@ class PreProcessor:
         """
         try:
             os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
-            self.df.to_csv(self.output_file)
+            # Small row groups let readers that only need the latest values skip the rest
+            self.df.to_parquet(self.output_file, engine="pyarrow", compression="snappy", row_group_size=PARQUET_ROW_GROUP_SIZE)
             self.logger.info(f"Preprocessed data saved to {self.output_file}", stacklevel=2)
         except Exception as e:
             self.logger.critical(f"Failed to save preprocessed data: {e}", stacklevel=2)
             raise
 
-if __name__ == "__main__":
+def main(df=None):
+    """
+    Runs pre-processing and returns the cleaned DataFrame.
+    If df is given it is used instead of reading the raw file.
+    """
     preprocessor = PreProcessor(
-        input_file="data/raw/system_metrics.csv",
-        output_file="data/preprocessed/system_metrics_preprocessed.csv"
+        input_file="data/raw/system_metrics.parquet",
+        output_file="data/preprocessed/system_metrics_preprocessed.parquet"
     )
-    preprocessor.load_data()
+    if df is None:
+        preprocessor.load_data()
+    else:
+        preprocessor.df = df.copy()
     preprocessor.process()
     preprocessor.save()
+    return preprocessor.df
+
+if __name__ == "__main__":
+    main()